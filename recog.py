@@ -1,20 +1,273 @@
-import speech_recognition as sr
 import subprocess
+import os
+import sys
+import argparse
+import hashlib
+import wave
+import shutil
+import threading
+import time
+import multiprocessing
+import tempfile
+from pathlib import Path
+from concurrent.futures import (ProcessPoolExecutor, ThreadPoolExecutor,
+                                as_completed)
 
-fileNumber = input("Masukkan nomor file: ")
+# Spesifikasi audio untuk recognizer: 16 kHz, mono, PCM 16-bit
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_CHANNELS = 1
+AUDIO_SAMPLE_WIDTH = 2
 
-audionameMp3 = "Track "+fileNumber+".mp3"
-audionameWav = "Track "+fileNumber+".wav"
-subprocess.call(['ffmpeg', '-i', audionameMp3, audionameWav])
+# Path ffmpeg dicari sekali saat import, bukan per konversi
+FFMPEG = shutil.which("ffmpeg") or "ffmpeg"
 
-txtname = "track"+fileNumber+".txt"
+# Audio dikirim ke Google per potongan sepanjang ini (detik)
+CHUNK_SECONDS = 30
 
-r = sr.Recognizer()
-r.dynamic_energy_threshold = True
-with sr.AudioFile(audionameWav) as source:
-    audio_data = r.record(source)
-    text = r.recognize_google(audio_data, language='id-ID')
-    print(text)
+# Batas waktu satu request ke Google (detik); tanpa ini satu potongan
+# yang macet bisa menahan seluruh transkripsi
+REQUEST_TIMEOUT = 15
 
-with open(txtname, 'w') as f:
-    f.write(text)
+# Batas total request ke Google yang berjalan bersamaan, untuk semua
+# proses dan thread sekaligus (endpoint-nya tidak resmi dan mudah
+# kena throttle)
+MAX_PARALLEL_REQUESTS = 4
+
+# Potongan yang gagal (RequestError/timeout) dicoba ulang sebanyak ini
+# dengan jeda 1 s, 2 s, ...; kalau tetap gagal, seluruh track gagal dan
+# tidak ada transkrip yang ditulis, supaya tidak ada teks bolong yang
+# tersimpan di cache
+CHUNK_RETRIES = 2
+
+# Hasil transkripsi disimpan per hash isi audio + bahasa + parameter yang
+# memengaruhi teks; naikkan CACHE_VERSION kalau cara menyusun teks berubah
+CACHE_DIR = Path("storage") / "cache"
+CACHE_VERSION = 2
+# Jumlah entri maksimum; yang paling lama tidak dipakai dihapus duluan
+CACHE_MAX_ENTRIES = 500
+
+# Satu Recognizer per proses, dibuat saat pertama kali dibutuhkan
+# oleh recognize()
+_RECOGNIZER = None
+
+# Slot request; diganti semaphore bersama oleh init_worker() di dalam pool
+_REQUEST_SLOTS = threading.BoundedSemaphore(MAX_PARALLEL_REQUESTS)
+
+
+def init_worker(requestSlots):
+    global _REQUEST_SLOTS
+    _REQUEST_SLOTS = requestSlots
+
+
+def init_recognizer():
+    global _RECOGNIZER
+    # speech_recognition baru di-import di sini (lewat recognize()), jadi
+    # --help dan cache hit tidak perlu memuatnya
+    import speech_recognition as sr
+    _RECOGNIZER = sr.Recognizer()
+    _RECOGNIZER.dynamic_energy_threshold = True
+    _RECOGNIZER.operation_timeout = REQUEST_TIMEOUT
+
+
+def write_text(filename, text):
+    # tulis ke file sementara lalu os.replace supaya pembaca tidak pernah
+    # melihat file yang setengah jadi
+    tmpname = filename.with_name(f"{filename.name}.{os.getpid()}.tmp")
+    with open(tmpname, 'w', encoding='utf-8', buffering=1 << 16) as f:
+        f.write(text)
+    os.replace(tmpname, filename)
+
+
+def is_wav16k(audioname):
+    # cek header WAV: sudah PCM 16-bit mono 16 kHz atau belum
+    try:
+        with wave.open(os.fspath(audioname), 'rb') as w:
+            return (w.getnchannels() == AUDIO_CHANNELS
+                    and w.getframerate() == AUDIO_SAMPLE_RATE
+                    and w.getsampwidth() == AUDIO_SAMPLE_WIDTH)
+    except (wave.Error, EOFError):
+        return False
+
+
+def read_chunks(audioname):
+    # PCM mentah per CHUNK_SECONDS, dibaca sendiri (bukan r.record()) supaya
+    # tidak ada frame yang hilang di batas potongan
+    framesPerChunk = CHUNK_SECONDS * AUDIO_SAMPLE_RATE
+    if is_wav16k(audioname):
+        with wave.open(os.fspath(audioname), 'rb') as w:
+            while frames := w.readframes(framesPerChunk):
+                yield frames
+        return
+
+    # PCM langsung dari stdout ffmpeg, tanpa file perantara di disk;
+    # resample dan downmix dilakukan ffmpeg, bukan di Python.
+    # stderr ditampung di file sementara, bukan pipe: kalau pipe stderr
+    # penuh (mis. MP3 rusak, satu baris error per frame) ffmpeg berhenti
+    # menulis stdout dan pembacaan di sini menunggu selamanya
+    with tempfile.TemporaryFile() as errfile:
+        proc = subprocess.Popen([FFMPEG, '-nostdin', '-hide_banner',
+                                 '-i', audioname,
+                                 '-ac', str(AUDIO_CHANNELS),
+                                 '-ar', str(AUDIO_SAMPLE_RATE),
+                                 '-f', 's16le', '-loglevel', 'error',
+                                 'pipe:1'],
+                                stdin=subprocess.DEVNULL,
+                                stdout=subprocess.PIPE, stderr=errfile)
+        finished = False
+        try:
+            bytesPerChunk = (framesPerChunk * AUDIO_SAMPLE_WIDTH
+                             * AUDIO_CHANNELS)
+            while frames := proc.stdout.read(bytesPerChunk):
+                yield frames
+            finished = True
+        finally:
+            if not finished:
+                proc.kill()
+            proc.stdout.close()
+            proc.wait()
+        if proc.returncode:
+            errfile.seek(0)
+            raise subprocess.CalledProcessError(proc.returncode, proc.args,
+                                                stderr=errfile.read())
+
+
+def recognize(audioname, language):
+    import speech_recognition as sr
+    if _RECOGNIZER is None:
+        init_recognizer()
+    r = _RECOGNIZER
+
+    failed = threading.Event()
+    # potongan yang sudah dibaca tapi belum selesai, per track
+    pending = threading.BoundedSemaphore(MAX_PARALLEL_REQUESTS)
+
+    def recognize_chunk(frames):
+        audio_data = sr.AudioData(frames, AUDIO_SAMPLE_RATE,
+                                  AUDIO_SAMPLE_WIDTH)
+        try:
+            for attempt in range(CHUNK_RETRIES + 1):
+                if failed.is_set():
+                    return ""
+                # slot global hanya dipegang selama request berjalan, tidak
+                # selama jeda retry, supaya track lain tetap jalan
+                with _REQUEST_SLOTS:
+                    try:
+                        return r.recognize_google(audio_data,
+                                                  language=language)
+                    except sr.UnknownValueError:
+                        return ""
+                    except (sr.RequestError, OSError):
+                        if attempt == CHUNK_RETRIES:
+                            failed.set()
+                            raise
+                time.sleep(2 ** attempt)
+        finally:
+            pending.release()
+
+    # tiap potongan langsung dikirim begitu selesai dibaca, jadi decode
+    # dan upload berjalan bersamaan; pembacaan menunggu sampai ada potongan
+    # yang selesai, jadi paling banyak MAX_PARALLEL_REQUESTS + 1 potongan
+    # ada di memori. Hasil digabung sesuai urutan.
+    futures = []
+    chunks = read_chunks(audioname)
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as ex:
+        try:
+            for frames in chunks:
+                pending.acquire()
+                if failed.is_set():
+                    pending.release()
+                    break
+                futures.append(ex.submit(recognize_chunk, frames))
+        finally:
+            chunks.close()
+        texts = [t for t in (f.result() for f in futures) if t]
+    if not texts:
+        raise sr.UnknownValueError()
+    return " ".join(texts)
+
+
+def cached_recognize(audioname, language):
+    h = hashlib.blake2b(digest_size=16)
+    with audioname.open('rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            h.update(block)
+    cachename = CACHE_DIR / (f"{h.hexdigest()}.{language}.v{CACHE_VERSION}"
+                             f"-{AUDIO_SAMPLE_RATE}hz-{CHUNK_SECONDS}s.txt")
+
+    try:
+        text = cachename.read_text(encoding='utf-8')
+    except FileNotFoundError:
+        text = None
+    if text is not None:
+        # mtime dipakai sebagai waktu terakhir dipakai untuk LRU
+        try:
+            os.utime(cachename)
+        except FileNotFoundError:
+            pass
+        return text
+
+    text = recognize(audioname, language)
+
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    write_text(cachename, text)
+    prune_cache()
+    return text
+
+
+def prune_cache():
+    entries = []
+    with os.scandir(CACHE_DIR) as it:
+        for entry in it:
+            if entry.name.endswith(".txt"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except FileNotFoundError:
+                    pass
+    if len(entries) <= CACHE_MAX_ENTRIES:
+        return
+    entries.sort()
+    for _, path in entries[:len(entries) - CACHE_MAX_ENTRIES]:
+        # proses lain bisa saja sudah menghapusnya
+        Path(path).unlink(missing_ok=True)
+
+
+def transcribe(fileNumber):
+    audioname = Path(f"Track {fileNumber}.mp3")
+    if not audioname.exists():
+        audioname = audioname.with_suffix(".wav")
+    txtname = Path(f"track{fileNumber}.txt")
+
+    text = cached_recognize(audioname, 'id-ID')
+    write_text(txtname, text)
+    return text
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(
+        description="Transkripsi file 'Track N.mp3' ke 'trackN.txt'.")
+    parser.add_argument('file_numbers', nargs='*', metavar='N',
+                        help="nomor file; jika kosong dibaca dari stdin")
+    fileNumbers = parser.parse_args().file_numbers
+    if not fileNumbers:
+        if sys.stdin.isatty():
+            fileNumbers = input("Masukkan nomor file (pisahkan dengan spasi): ").split()
+        else:
+            fileNumbers = sys.stdin.read().split()
+
+    requestSlots = multiprocessing.BoundedSemaphore(MAX_PARALLEL_REQUESTS)
+    failures = 0
+    with ProcessPoolExecutor(max_workers=os.cpu_count(),
+                             initializer=init_worker,
+                             initargs=(requestSlots,)) as ex:
+        futures = {ex.submit(transcribe, n): n for n in fileNumbers}
+        # hasil dicetak per track begitu selesai, diberi nomor track supaya
+        # jelas milik siapa; satu track gagal tidak menghentikan yang lain
+        for future in as_completed(futures):
+            fileNumber = futures[future]
+            try:
+                print(f"Track {fileNumber}: {future.result()}")
+            except Exception as e:
+                failures += 1
+                print(f"Track {fileNumber} gagal: {type(e).__name__}: {e}",
+                      file=sys.stderr)
+    sys.exit(1 if failures else 0)
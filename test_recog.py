@@ -0,0 +1,250 @@
+import os
+import sys
+import subprocess
+import tempfile
+import threading
+import types
+import unittest
+import wave
+from pathlib import Path
+from unittest import mock
+
+import recog
+
+
+class ReadChunksTest(unittest.TestCase):
+
+    def test_no_frames_lost_between_chunks(self):
+        nframes = 65 * recog.AUDIO_SAMPLE_RATE
+        pcm = bytes(range(256)) * (nframes * recog.AUDIO_SAMPLE_WIDTH // 256)
+        with tempfile.TemporaryDirectory() as tmp:
+            wavname = os.path.join(tmp, "Track 65.wav")
+            with wave.open(wavname, 'wb') as w:
+                w.setnchannels(recog.AUDIO_CHANNELS)
+                w.setsampwidth(recog.AUDIO_SAMPLE_WIDTH)
+                w.setframerate(recog.AUDIO_SAMPLE_RATE)
+                w.writeframes(pcm)
+
+            chunks = list(recog.read_chunks(wavname))
+
+        chunkBytes = (recog.CHUNK_SECONDS * recog.AUDIO_SAMPLE_RATE
+                      * recog.AUDIO_SAMPLE_WIDTH)
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual([len(c) for c in chunks[:-1]], [chunkBytes] * 2)
+        self.assertEqual(b"".join(chunks), pcm)
+
+    def fake_ffmpeg(self, tmp, body):
+        # skrip Python yang berperan sebagai ffmpeg
+        script = Path(tmp) / "ffmpeg"
+        script.write_text("#!" + sys.executable + "\nimport sys\n" + body)
+        script.chmod(0o755)
+        (Path(tmp) / "a.mp3").write_bytes(b"bukan wav")
+        return mock.patch.object(recog, 'FFMPEG', str(script))
+
+    def test_ffmpeg_pipe_survives_stderr_flood(self):
+        nbytes = 2 * recog.CHUNK_SECONDS * recog.AUDIO_SAMPLE_RATE * 2 + 10
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.fake_ffmpeg(tmp, (
+                    "sys.stderr.write('Header missing\\n' * 20000)\n"
+                    "sys.stderr.flush()\n"
+                    f"sys.stdout.buffer.write(b'\\x01' * {nbytes})\n")):
+                chunks = list(recog.read_chunks(Path(tmp) / "a.mp3"))
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(sum(map(len, chunks)), nbytes)
+
+    def test_ffmpeg_failure_reports_stderr(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.fake_ffmpeg(tmp, (
+                    "sys.stderr.write('Invalid data found\\n' * 20000)\n"
+                    "sys.exit(1)\n")):
+                with self.assertRaises(subprocess.CalledProcessError) as cm:
+                    list(recog.read_chunks(Path(tmp) / "a.mp3"))
+        self.assertEqual(cm.exception.returncode, 1)
+        self.assertTrue(cm.exception.stderr.startswith(b"Invalid data found"))
+
+
+class CacheTest(unittest.TestCase):
+
+    def test_hit_skips_recognize_and_prune_keeps_newest(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cacheDir = Path(tmp) / "cache"
+            audioname = Path(tmp) / "Track 1.wav"
+            audioname.write_bytes(b"audio")
+            with mock.patch.object(recog, 'CACHE_DIR', cacheDir), \
+                    mock.patch.object(recog, 'CACHE_MAX_ENTRIES', 2), \
+                    mock.patch.object(recog, 'recognize',
+                                      return_value="halo") as rec:
+                self.assertEqual(
+                    recog.cached_recognize(audioname, 'id-ID'), "halo")
+                self.assertEqual(
+                    recog.cached_recognize(audioname, 'id-ID'), "halo")
+                self.assertEqual(rec.call_count, 1)
+
+                for i, name in enumerate(["a.txt", "b.txt"]):
+                    (cacheDir / name).write_text("x")
+                    os.utime(cacheDir / name, (i, i))
+                recog.prune_cache()
+
+            self.assertEqual(sorted(p.name for p in cacheDir.iterdir()),
+                             sorted([next(cacheDir.glob("*.v*.txt")).name,
+                                     "b.txt"]))
+
+
+
+def fake_speech_recognition():
+    sr = types.ModuleType("speech_recognition")
+
+    class UnknownValueError(Exception):
+        pass
+
+    class RequestError(Exception):
+        pass
+
+    class AudioData:
+        def __init__(self, frame_data, sample_rate, sample_width):
+            self.frame_data = frame_data
+
+    sr.UnknownValueError = UnknownValueError
+    sr.RequestError = RequestError
+    sr.AudioData = AudioData
+    return sr
+
+
+class FakeRecognizer:
+    # hasil per potongan ditentukan oleh byte pertamanya lewat respond()
+    def __init__(self, respond):
+        self.respond = respond
+        self.lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.calls = []
+
+    def recognize_google(self, audio_data, language):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            self.calls.append(audio_data.frame_data[0])
+        try:
+            return self.respond(audio_data.frame_data[0])
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class RecognizeTest(unittest.TestCase):
+
+    def setUp(self):
+        self.sr = fake_speech_recognition()
+        self.slots = threading.BoundedSemaphore(recog.MAX_PARALLEL_REQUESTS)
+        for patcher in [
+                mock.patch.dict(sys.modules, speech_recognition=self.sr),
+                mock.patch.object(recog, '_REQUEST_SLOTS', self.slots),
+                mock.patch.object(recog.time, 'sleep')]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_recognize(self, respond, nchunks, cached=None):
+        # cached: lewat cached_recognize() dengan file audio ini
+        self.recognizer = recognizer = FakeRecognizer(respond)
+        chunks = (bytes([i]) * 8 for i in range(1, nchunks + 1))
+        with mock.patch.object(recog, '_RECOGNIZER', recognizer), \
+                mock.patch.object(recog, 'read_chunks',
+                                  return_value=chunks):
+            if cached is not None:
+                return recognizer, recog.cached_recognize(cached, 'id-ID')
+            return recognizer, recog.recognize("Track 1.mp3", 'id-ID')
+
+    def test_retry_sleeps_without_holding_a_slot(self):
+        seen = []
+        attempts = []
+
+        def respond(n):
+            attempts.append(n)
+            if len(attempts) == 1:
+                raise self.sr.RequestError("throttled")
+            return "teks"
+
+        recog.time.sleep.side_effect = lambda s: seen.append(
+            self.slots._value)
+        _, text = self.run_recognize(respond, 1)
+        self.assertEqual(text, "teks")
+        self.assertEqual(seen, [recog.MAX_PARALLEL_REQUESTS])
+        self.assertEqual(self.slots._value, recog.MAX_PARALLEL_REQUESTS)
+
+    def test_every_chunk_retrying_does_not_deadlock(self):
+        seen = set()
+        lock = threading.Lock()
+
+        def respond(n):
+            with lock:
+                first = n not in seen
+                seen.add(n)
+            if first:
+                raise self.sr.RequestError("throttled")
+            return f"c{n}"
+
+        # jeda retry sungguhan (singkat) supaya pembaca sempat mengambil
+        # slot yang dilepas selama jeda
+        recog.time.sleep.side_effect = lambda s: threading.Event().wait(0.02)
+        result = []
+        worker = threading.Thread(
+            target=lambda: result.append(self.run_recognize(respond, 20)),
+            daemon=True)
+        worker.start()
+        worker.join(timeout=10)
+        self.assertFalse(worker.is_alive(), "recognize() macet")
+        self.assertEqual(result[0][1],
+                         " ".join(f"c{n}" for n in range(1, 21)))
+        self.assertEqual(self.slots._value, recog.MAX_PARALLEL_REQUESTS)
+
+    def test_failed_chunk_fails_track_without_caching(self):
+        gate = threading.Event()
+        attempts = []
+
+        def respond(n):
+            if n == 2:
+                attempts.append(n)
+                if len(attempts) == recog.CHUNK_RETRIES + 1:
+                    gate.set()
+                raise self.sr.RequestError("throttled")
+            gate.wait(timeout=5)
+            return f"c{n}"
+
+        with tempfile.TemporaryDirectory() as tmp:
+            audioname = Path(tmp) / "Track 1.mp3"
+            audioname.write_bytes(b"audio")
+            with mock.patch.object(recog, 'CACHE_DIR', Path(tmp) / "cache"):
+                with self.assertRaises(self.sr.RequestError):
+                    self.run_recognize(respond, 50, cached=audioname)
+            self.assertFalse((Path(tmp) / "cache").exists())
+
+        self.assertEqual(len(attempts), recog.CHUNK_RETRIES + 1)
+        self.assertLess(len(self.recognizer.calls), 50)
+        self.assertEqual(self.slots._value, recog.MAX_PARALLEL_REQUESTS)
+
+    def test_global_slots_cap_concurrent_requests(self):
+        self.slots = threading.BoundedSemaphore(2)
+        patcher = mock.patch.object(recog, '_REQUEST_SLOTS', self.slots)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        def respond(n):
+            threading.Event().wait(0.01)
+            return f"c{n}"
+
+        recognizer, text = self.run_recognize(respond, 12)
+        self.assertEqual(recognizer.peak, 2)
+        self.assertEqual(text, " ".join(f"c{n}" for n in range(1, 13)))
+        self.assertEqual(self.slots._value, 2)
+
+    def test_all_silent_track_raises_unknown_value(self):
+        def respond(n):
+            raise self.sr.UnknownValueError()
+
+        with self.assertRaises(self.sr.UnknownValueError):
+            self.run_recognize(respond, 3)
+        self.assertEqual(self.slots._value, recog.MAX_PARALLEL_REQUESTS)
+
+
+if __name__ == '__main__':
+    unittest.main()